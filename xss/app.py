@@ -1,14 +1,22 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 from scanner.xss_detector import XSSDetector
 from scanner.url_scanner import URLScanner
 import logging
+import os
 import threading
 from database import Database
+from job_queue import create_job_queue
+import export
+import worker
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
+# 'thread' - сканирование в потоке этого процесса, 'queue' - через очередь воркеров (worker.py)
+app.config['SCAN_MODE'] = os.environ.get('XSS_SCAN_MODE', 'thread')
+app.config['JOB_QUEUE_BACKEND'] = os.environ.get('XSS_JOB_QUEUE_BACKEND', 'sqlite')
 
 db = Database()
+job_queue = create_job_queue(app.config['JOB_QUEUE_BACKEND'], db=db)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -39,18 +47,37 @@ def scan():
         scan_id = str(hash(url + scan_type))
         db.create_scan(scan_id, url, scan_type)
 
-        thread = threading.Thread(
-            target=run_scan,
-            args=(url, scan_type, scan_id)
-        )
-        thread.daemon = True
-        thread.start()
+        if app.config['SCAN_MODE'] == 'queue':
+            job_queue.enqueue(scan_id, url, scan_type)
+        else:
+            thread = threading.Thread(
+                target=run_scan,
+                args=(url, scan_type, scan_id)
+            )
+            thread.daemon = True
+            thread.start()
 
         return render_template('scan.html', scan_id=scan_id, url=url)
 
     return render_template('scan.html')
 
 
+@app.route('/scan/<scan_id>/cancel', methods=['POST'])
+def cancel_scan(scan_id):
+    if not db.request_cancel(scan_id):
+        status = db.get_scan_status(scan_id)
+        if status['status'] == 'not_found':
+            return jsonify({'error': 'Сканирование не найдено'}), 404
+        return jsonify({'error': 'Сканирование уже завершено', **status}), 409
+
+    # Задание ещё не взято воркером - сканирование отменяется сразу
+    if job_queue.cancel(scan_id):
+        db.update_scan_status(scan_id, 'cancelled', 0, 'Сканирование отменено')
+
+    logger.info(f"Запрошена отмена сканирования {scan_id}")
+    return jsonify({'scan_id': scan_id, 'status': 'cancelling'})
+
+
 @app.route('/scan_status/<scan_id>')
 def get_scan_status(scan_id):
     status = db.get_scan_status(scan_id)
@@ -108,31 +135,47 @@ def api_scan():
 
         scan_id = str(hash(url + scan_type))
         db.create_scan(scan_id, url, scan_type)
-        db.save_scan_results(scan_id, results)
-        db.update_scan_status(scan_id, 'completed', 100, 'Сканирование завершено')
+        worker.save_results(db, scan_id, results)
 
         return jsonify({'scan_id': scan_id, **results})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-def run_scan(url, scan_type, scan_id):
-    try:
-        logger.info(f"Начато сканирование URL: {url}")
-
-        db.update_scan_status(scan_id, 'running', 25, 'Инициализация сканера...')
-
-        scanner = URLScanner()
+@app.route('/api/export')
+def api_export():
+    fmt = request.args.get('format', 'jsonl')
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
 
-        db.update_scan_status(scan_id, 'running', 50, 'Сканирование на XSS...')
+    if fmt not in export.EXPORT_FORMATS:
+        return jsonify({'error': f'Неизвестный формат: {fmt}'}), 400
+    try:
+        filters = export.parse_filters(
+            request.args.get('since'),
+            request.args.get('until'),
+            request.args.get('host'),
+            request.args.get('severity')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-        results = scanner.scan_url(url, scan_type)
+    mimetype, extension = export.EXPORT_FORMATS[fmt]
+    filename = f'xss_scans.{extension}'
+    if compress:
+        mimetype = 'application/gzip'
+        filename += '.gz'
 
-        db.save_scan_results(scan_id, results)
-        db.update_scan_status(scan_id, 'completed', 100, 'Сканирование завершено')
+    stream = export.encode_stream(export.export(db, fmt, **filters), compress=compress)
+    return Response(
+        stream_with_context(stream),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
 
-        logger.info(f"Сканирование завершено для URL: {url}")
 
+def run_scan(url, scan_type, scan_id):
+    try:
+        worker.run_scan(db, url, scan_type, scan_id)
     except Exception as e:
         logger.error(f"Ошибка при сканировании: {str(e)}")
         db.update_scan_status(scan_id, 'error', 0, f'Ошибка: {str(e)}')
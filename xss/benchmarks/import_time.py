@@ -0,0 +1,75 @@
+"""
+Бенчмарк времени импорта модулей сканера.
+
+Каждый замер выполняется в отдельном процессе интерпретатора, чтобы
+кэш модулей не искажал результат. Скрипт завершается с кодом 1, если
+медиана превышает бюджет.
+
+    python benchmarks/import_time.py --module app --runs 10 --budget-ms 400
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Целевые бюджеты (медиана, мс) для холодного импорта
+IMPORT_BUDGETS_MS = {
+    'scanner.xss_detector': 50,
+    'scanner.url_scanner': 200,
+    'app': 400,
+}
+
+
+def measure_import(module, runs=5):
+    """Возвращает список времён импорта модуля (мс) в чистых процессах"""
+    code = (
+        'import time; t = time.perf_counter(); '
+        f'import {module}; '
+        'print((time.perf_counter() - t) * 1000)'
+    )
+    env = dict(os.environ, PYTHONPATH=PROJECT_DIR, PYTHONDONTWRITEBYTECODE='1')
+    timings = []
+    # Запуск во временном каталоге, чтобы не трогать рабочие лог и базу
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, '-c', code],
+                cwd=workdir, env=env, capture_output=True, text=True, check=True
+            ).stdout
+            timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк времени импорта')
+    parser.add_argument('--module', action='append',
+                        help='модуль для замера (по умолчанию все из IMPORT_BUDGETS_MS)')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float,
+                        help='переопределить бюджет для всех модулей')
+    args = parser.parse_args()
+
+    modules = args.module or list(IMPORT_BUDGETS_MS)
+    failed = False
+    started = time.perf_counter()
+
+    for module in modules:
+        timings = measure_import(module, args.runs)
+        median = statistics.median(timings)
+        budget = args.budget_ms or IMPORT_BUDGETS_MS.get(module, 1000)
+        status = 'OK' if median <= budget else 'FAIL'
+        failed = failed or status == 'FAIL'
+        print(f"{module:<24} median={median:8.1f} ms  max={max(timings):8.1f} ms  "
+              f"budget={budget:.0f} ms  {status}")
+
+    print(f"Всего: {time.perf_counter() - started:.1f} с")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Бенчмарк масштабирования воркеров очереди сканирования.
+
+Поднимает локальный HTTP-сервер с искусственной задержкой ответа, ставит
+в очередь --jobs заданий и обрабатывает их сначала одним процессом, затем
+--processes процессами. Всё выполняется офлайн во временной базе.
+
+    python benchmarks/workers.py --jobs 40 --processes 4 --delay 0.2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+from job_queue import create_job_queue  # noqa: E402
+from worker import run_workers  # noqa: E402
+
+PAGE = (
+    '<html><body>'
+    '<form action="/search"><input name="q" value="<script>alert(1)</script>"></form>'
+    '<a href="javascript:alert(1)">link</a>'
+    '</body></html>'
+).encode('utf-8')
+
+
+def start_server(delay):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(PAGE)))
+            self.end_headers()
+            self.wfile.write(PAGE)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def run_round(base_url, jobs, processes, workdir):
+    db_path = os.path.join(workdir, f'bench_{processes}.db')
+    db = Database(db_path)
+    queue = create_job_queue('sqlite', db=db)
+
+    for i in range(jobs):
+        scan_id = f'bench-{processes}-{i}'
+        url = f'{base_url}/page?id={i}'
+        db.create_scan(scan_id, url, 'deep')
+        queue.enqueue(scan_id, url, 'deep')
+
+    started = time.perf_counter()
+    run_workers(processes, db_path, poll_interval=0.05, exit_when_idle=True)
+    elapsed = time.perf_counter() - started
+
+    stats = queue.stats()
+    if stats.get('done', 0) != jobs:
+        raise RuntimeError(f'Не все задания выполнены: {stats}')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк воркеров')
+    parser.add_argument('--jobs', type=int, default=40)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--delay', type=float, default=0.2,
+                        help='задержка ответа тестового сервера, с')
+    parser.add_argument('--min-efficiency', type=float, default=0.7,
+                        help='минимальная доля от линейного ускорения')
+    args = parser.parse_args()
+
+    server = start_server(args.delay)
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    with tempfile.TemporaryDirectory() as workdir:
+        single = run_round(base_url, args.jobs, 1, workdir)
+        parallel = run_round(base_url, args.jobs, args.processes, workdir)
+
+    server.shutdown()
+
+    speedup = single / parallel
+    efficiency = speedup / args.processes
+    print(f"Заданий: {args.jobs}, задержка сервера: {args.delay:.2f} с")
+    print(f"1 процесс:  {single:.2f} с ({args.jobs / single:.1f} заданий/с)")
+    print(f"{args.processes} процесса: {parallel:.2f} с ({args.jobs / parallel:.1f} заданий/с)")
+    print(f"Ускорение: x{speedup:.2f}, эффективность {efficiency:.0%}")
+
+    return 0 if efficiency >= args.min_efficiency else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
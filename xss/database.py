@@ -1,21 +1,32 @@
+import ast
 import sqlite3
 import logging
+import threading
 from contextlib import contextmanager
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Версия схемы, хранится в PRAGMA user_version
+SCHEMA_VERSION = 3
+
 
 class Database:
     def __init__(self, db_path='xss_scanner.db'):
         self.db_path = db_path
-        self.init_db()
-        self.seed_recommendations()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connect(self):
+        # Ожидание блокировки нужно, когда базу делят несколько процессов-воркеров
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
 
     @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        self.ensure_schema()
+        conn = self._connect()
         try:
             yield conn
             conn.commit()
@@ -26,67 +37,132 @@ class Database:
         finally:
             conn.close()
 
+    def ensure_schema(self):
+        """Выполняет миграцию схемы один раз при первом обращении к базе"""
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if not self._schema_ready:
+                self.init_db()
+                self._schema_ready = True
+
     def init_db(self):
-        with self.get_connection() as conn:
+        """Применяет миграции, которых ещё нет в базе (по PRAGMA user_version)"""
+        migrations = [self._migrate_v1, self._migrate_v2, self._migrate_v3]
+
+        conn = self._connect()
+        try:
             cursor = conn.cursor()
+            version = cursor.execute('PRAGMA user_version').fetchone()[0]
+            if version >= SCHEMA_VERSION:
+                return
 
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS scans (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    scan_id TEXT UNIQUE NOT NULL,
-                    url TEXT NOT NULL,
-                    scan_type TEXT NOT NULL,
-                    status TEXT DEFAULT 'pending',
-                    progress INTEGER DEFAULT 0,
-                    message TEXT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    completed_at DATETIME
-                )
-            ''')
+            # Блокировка на запись, чтобы параллельные процессы не мигрировали одновременно
+            cursor.execute('BEGIN IMMEDIATE')
+            version = cursor.execute('PRAGMA user_version').fetchone()[0]
 
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS vulnerabilities (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    scan_id TEXT NOT NULL,
-                    vuln_type TEXT NOT NULL,
-                    severity TEXT NOT NULL,
-                    description TEXT,
-                    location TEXT,
-                    evidence TEXT,
-                    risk_score INTEGER,
-                    FOREIGN KEY (scan_id) REFERENCES scans(scan_id) ON DELETE CASCADE
-                )
-            ''')
+            for target, migrate in enumerate(migrations, start=1):
+                if target > version:
+                    migrate(cursor)
+                    logger.info("Database schema migrated to version %d", target)
 
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS scan_summaries (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    scan_id TEXT UNIQUE NOT NULL,
-                    total_vulnerabilities INTEGER DEFAULT 0,
-                    high_risk INTEGER DEFAULT 0,
-                    medium_risk INTEGER DEFAULT 0,
-                    low_risk INTEGER DEFAULT 0,
-                    total_risk_score INTEGER DEFAULT 0,
-                    security_level TEXT,
-                    FOREIGN KEY (scan_id) REFERENCES scans(scan_id) ON DELETE CASCADE
-                )
-            ''')
+            cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Database migration error: {str(e)}")
+            raise
+        finally:
+            conn.close()
 
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS recommendations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    severity TEXT NOT NULL,
-                    title TEXT NOT NULL,
-                    description TEXT NOT NULL,
-                    priority INTEGER DEFAULT 0
-                )
-            ''')
+    def _migrate_v1(self, cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scans (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                scan_id TEXT UNIQUE NOT NULL,
+                url TEXT NOT NULL,
+                scan_type TEXT NOT NULL,
+                status TEXT DEFAULT 'pending',
+                progress INTEGER DEFAULT 0,
+                message TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                completed_at DATETIME
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS vulnerabilities (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                scan_id TEXT NOT NULL,
+                vuln_type TEXT NOT NULL,
+                severity TEXT NOT NULL,
+                description TEXT,
+                location TEXT,
+                evidence TEXT,
+                risk_score INTEGER,
+                FOREIGN KEY (scan_id) REFERENCES scans(scan_id) ON DELETE CASCADE
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scan_summaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                scan_id TEXT UNIQUE NOT NULL,
+                total_vulnerabilities INTEGER DEFAULT 0,
+                high_risk INTEGER DEFAULT 0,
+                medium_risk INTEGER DEFAULT 0,
+                low_risk INTEGER DEFAULT 0,
+                total_risk_score INTEGER DEFAULT 0,
+                security_level TEXT,
+                FOREIGN KEY (scan_id) REFERENCES scans(scan_id) ON DELETE CASCADE
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS recommendations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                severity TEXT NOT NULL,
+                title TEXT NOT NULL,
+                description TEXT NOT NULL,
+                priority INTEGER DEFAULT 0
+            )
+        ''')
 
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_scans_scan_id ON scans(scan_id)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_vulns_scan_id ON vulnerabilities(scan_id)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_vulns_severity ON vulnerabilities(severity)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_scans_scan_id ON scans(scan_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_vulns_scan_id ON vulnerabilities(scan_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_vulns_severity ON vulnerabilities(severity)')
 
-    def seed_recommendations(self):
+        self.seed_recommendations(cursor)
+
+    def _migrate_v2(self, cursor):
+        # Очередь заданий для распределённых воркеров (см. job_queue.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scan_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                scan_id TEXT NOT NULL,
+                url TEXT NOT NULL,
+                scan_type TEXT NOT NULL,
+                status TEXT DEFAULT 'queued',
+                attempts INTEGER DEFAULT 0,
+                max_attempts INTEGER DEFAULT 3,
+                worker_id TEXT,
+                lease_expires REAL,
+                available_at REAL DEFAULT 0,
+                last_error TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (scan_id) REFERENCES scans(scan_id) ON DELETE CASCADE
+            )
+        ''')
+
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON scan_jobs(status, available_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_scan_id ON scan_jobs(scan_id)')
+
+    def _migrate_v3(self, cursor):
+        # Флаг отмены, который проверяют сканирующие потоки и воркеры
+        cursor.execute('ALTER TABLE scans ADD COLUMN cancel_requested INTEGER DEFAULT 0')
+
+    def seed_recommendations(self, cursor):
         recommendations = [
             ('high', 'Немедленная блокировка',
              'Немедленно заблокируйте атакующий IP-адрес и проверьте журналы сервера.', 1),
@@ -114,14 +190,12 @@ class Database:
              'Обеспечьте регулярное резервное копирование.', 3),
         ]
 
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM recommendations')
-            if cursor.fetchone()[0] == 0:
-                cursor.executemany('''
-                    INSERT INTO recommendations (severity, title, description, priority)
-                    VALUES (?, ?, ?, ?)
-                ''', recommendations)
+        cursor.execute('SELECT COUNT(*) FROM recommendations')
+        if cursor.fetchone()[0] == 0:
+            cursor.executemany('''
+                INSERT INTO recommendations (severity, title, description, priority)
+                VALUES (?, ?, ?, ?)
+            ''', recommendations)
 
     def create_scan(self, scan_id, url, scan_type):
         with self.get_connection() as conn:
@@ -135,7 +209,7 @@ class Database:
     def update_scan_status(self, scan_id, status, progress=0, message=''):
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            if status == 'completed':
+            if status in ('completed', 'truncated', 'cancelled'):
                 cursor.execute('''
                     UPDATE scans 
                     SET status = ?, progress = ?, message = ?, completed_at = CURRENT_TIMESTAMP
@@ -148,10 +222,32 @@ class Database:
                     WHERE scan_id = ?
                 ''', (status, progress, message, scan_id))
 
+    def request_cancel(self, scan_id):
+        """Помечает сканирование для отмены; False, если оно уже завершено"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE scans
+                SET cancel_requested = 1, message = 'Отмена...'
+                WHERE scan_id = ? AND status IN ('pending', 'running')
+            ''', (scan_id,))
+            return cursor.rowcount == 1
+
+    def is_cancel_requested(self, scan_id):
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT cancel_requested FROM scans WHERE scan_id = ?', (scan_id,))
+            row = cursor.fetchone()
+            return bool(row and row['cancel_requested'])
+
     def save_scan_results(self, scan_id, results):
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
+            # Повторное сохранение (например, после повтора задания) заменяет прежние результаты
+            cursor.execute('DELETE FROM vulnerabilities WHERE scan_id = ?', (scan_id,))
+            cursor.execute('DELETE FROM scan_summaries WHERE scan_id = ?', (scan_id,))
+
             vulnerabilities = results.get('vulnerabilities', [])
             for vuln in vulnerabilities:
                 cursor.execute('''
@@ -211,6 +307,7 @@ class Database:
                 'scan_id': scan_id,
                 'url': scan_data['url'],
                 'scan_type': scan_data['scan_type'],
+                'status': scan_data['status'],
                 'timestamp': scan_data['timestamp'],
                 'vulnerabilities': vulnerabilities,
                 'scan_summary': summary
@@ -278,4 +375,83 @@ class Database:
             severity_stats = {row['severity']: row['count'] for row in cursor.fetchall()}
 
             stats['vulnerabilities_by_severity'] = severity_stats
-            return stats
\ No newline at end of file
+            return stats
+
+    def iter_export_chunks(self, since=None, until=None, host=None, severities=None, chunk_size=500):
+        """
+        Выдаёт сканирования порциями по chunk_size вместе с уязвимостями и
+        сводкой. Каждая порция читается отдельным коротким запросом по
+        ключу (s.id > последний), поэтому память не зависит от объёма
+        истории, а запись в базу не блокируется на время выгрузки.
+        """
+        conditions = ['s.id > ?']
+        params = []
+        if since:
+            conditions.append('s.timestamp >= ?')
+            params.append(since)
+        if until:
+            conditions.append('s.timestamp <= ?')
+            params.append(until)
+        if host:
+            # Грубый отбор в SQL, точное сравнение хоста делает вызывающий код
+            conditions.append('s.url LIKE ?')
+            params.append(f'%{host}%')
+
+        vuln_filter = ''
+        vuln_params = []
+        if severities:
+            placeholders = ', '.join('?' for _ in severities)
+            vuln_filter = f' AND severity IN ({placeholders})'
+            vuln_params = list(severities)
+            conditions.append(f'''EXISTS (
+                SELECT 1 FROM vulnerabilities v
+                WHERE v.scan_id = s.scan_id AND v.severity IN ({placeholders})
+            )''')
+            params.extend(severities)
+
+        query = f'''
+            SELECT s.* FROM scans s
+            WHERE {' AND '.join(conditions)}
+            ORDER BY s.id
+            LIMIT ?
+        '''
+
+        last_id = 0
+        while True:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, [last_id] + params + [chunk_size])
+                scans = [dict(row) for row in cursor.fetchall()]
+                if not scans:
+                    return
+
+                scan_ids = [scan['scan_id'] for scan in scans]
+                placeholders = ', '.join('?' for _ in scan_ids)
+
+                cursor.execute(f'''
+                    SELECT * FROM vulnerabilities
+                    WHERE scan_id IN ({placeholders}){vuln_filter}
+                    ORDER BY id
+                ''', scan_ids + vuln_params)
+                vulnerabilities = {}
+                for row in cursor.fetchall():
+                    vuln = dict(row)
+                    try:
+                        vuln['evidence'] = ast.literal_eval(vuln['evidence']) if vuln['evidence'] else []
+                    except (ValueError, SyntaxError):
+                        vuln['evidence'] = [vuln['evidence']]
+                    vulnerabilities.setdefault(vuln['scan_id'], []).append(vuln)
+
+                cursor.execute(f'''
+                    SELECT * FROM scan_summaries WHERE scan_id IN ({placeholders})
+                ''', scan_ids)
+                summaries = {row['scan_id']: dict(row) for row in cursor.fetchall()}
+
+            for scan in scans:
+                scan['vulnerabilities'] = vulnerabilities.get(scan['scan_id'], [])
+                scan['scan_summary'] = summaries.get(scan['scan_id'], {})
+
+            yield scans
+            last_id = scans[-1]['id']
+            if len(scans) < chunk_size:
+                return
@@ -0,0 +1,274 @@
+"""
+Потоковая выгрузка результатов сканирований в SARIF, JSONL и CSV.
+
+Данные читаются из базы порциями и сразу пишутся в поток, поэтому
+объём памяти не зависит от размера истории. Используется HTTP-эндпоинтом
+/api/export и из командной строки:
+
+    python export.py --format sarif --since 2026-01-01 --severity high --gzip -o scans.sarif.gz
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+import zlib
+from datetime import datetime
+from urllib.parse import urlparse
+
+from database import Database
+
+EXPORT_FORMATS = {
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'csv': ('text/csv', 'csv'),
+    'sarif': ('application/sarif+json', 'sarif'),
+}
+
+SEVERITIES = ('high', 'medium', 'low')
+DATE_FORMATS = ('%Y-%m-%d', '%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S')
+
+SARIF_SCHEMA = 'https://json.schemastore.org/sarif-2.1.0.json'
+SARIF_LEVELS = {'high': 'error', 'medium': 'warning', 'low': 'note'}
+SARIF_RULES = [
+    {'id': 'reflected_xss', 'name': 'ReflectedXSS',
+     'shortDescription': {'text': 'Отражённая XSS'}},
+    {'id': 'stored_xss', 'name': 'StoredXSS',
+     'shortDescription': {'text': 'Хранимая XSS'}},
+    {'id': 'dom_xss', 'name': 'DomXSS',
+     'shortDescription': {'text': 'DOM-based XSS'}},
+]
+
+CSV_COLUMNS = [
+    'scan_id', 'url', 'scan_type', 'status', 'timestamp', 'completed_at', 'security_level',
+    'vuln_type', 'severity', 'risk_score', 'description', 'location', 'evidence',
+]
+
+
+def parse_filters(since=None, until=None, host=None, severity=None):
+    """Проверяет и нормализует фильтры выгрузки; ValueError при ошибке"""
+    filters = {}
+
+    if since:
+        filters['since'] = _parse_date(since, 'since')
+    if until:
+        until = _parse_date(until, 'until')
+        # Дата без времени включает весь день, время без секунд - всю минуту
+        if len(until) == 10:
+            until += ' 23:59:59'
+        elif len(until) == 16:
+            until += ':59'
+        filters['until'] = until
+    if host:
+        filters['host'] = host.strip().lower()
+    if severity:
+        severities = [s.strip().lower() for s in severity.split(',') if s.strip()]
+        unknown = [s for s in severities if s not in SEVERITIES]
+        if unknown:
+            raise ValueError(f'Неизвестный уровень: {", ".join(unknown)}')
+        filters['severities'] = severities
+
+    return filters
+
+
+def _parse_date(value, name):
+    value = value.strip().replace('T', ' ')
+    for fmt in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        # Строки сравниваются с датами в базе, поэтому формат должен совпадать точно
+        if parsed.strftime(fmt) == value:
+            return value
+    raise ValueError(f'Параметр {name} должен быть датой вида ГГГГ-ММ-ДД[ ЧЧ:ММ[:СС]]')
+
+
+def iter_scans(db, chunk_size=500, **filters):
+    """Сканирования с уязвимостями по одному, с точной фильтрацией по хосту"""
+    host = filters.get('host')
+    for chunk in db.iter_export_chunks(chunk_size=chunk_size, **filters):
+        for scan in chunk:
+            if host and (urlparse(scan['url']).hostname or '').lower() != host:
+                continue
+            yield scan
+
+
+def _scan_record(scan):
+    summary = scan['scan_summary']
+    return {
+        'scan_id': scan['scan_id'],
+        'url': scan['url'],
+        'scan_type': scan['scan_type'],
+        'status': scan['status'],
+        'timestamp': scan['timestamp'],
+        'completed_at': scan['completed_at'],
+        'scan_summary': {k: v for k, v in summary.items() if k not in ('id', 'scan_id')},
+        'vulnerabilities': [
+            {
+                'type': vuln['vuln_type'],
+                'severity': vuln['severity'],
+                'description': vuln['description'],
+                'location': vuln['location'],
+                'evidence': vuln['evidence'],
+                'risk_score': vuln['risk_score'],
+            }
+            for vuln in scan['vulnerabilities']
+        ],
+    }
+
+
+def export_jsonl(scans):
+    for scan in scans:
+        yield json.dumps(_scan_record(scan), ensure_ascii=False) + '\n'
+
+
+def export_csv(scans):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer.writerow(CSV_COLUMNS)
+    yield flush()
+
+    for scan in scans:
+        base = [
+            scan['scan_id'], scan['url'], scan['scan_type'], scan['status'],
+            scan['timestamp'], scan['completed_at'],
+            scan['scan_summary'].get('security_level', ''),
+        ]
+        # Сканирование без находок выгружается одной строкой с пустыми полями
+        vulnerabilities = scan['vulnerabilities'] or [None]
+        for vuln in vulnerabilities:
+            if vuln is None:
+                writer.writerow(base + [''] * 6)
+            else:
+                writer.writerow(base + [
+                    vuln['vuln_type'], vuln['severity'], vuln['risk_score'],
+                    vuln['description'], vuln['location'],
+                    json.dumps(vuln['evidence'], ensure_ascii=False),
+                ])
+        yield flush()
+
+
+def export_sarif(scans):
+    """SARIF 2.1.0: один run, по результату на каждую уязвимость"""
+    header = {
+        'version': '2.1.0',
+        '$schema': SARIF_SCHEMA,
+        'runs': [{
+            'tool': {'driver': {'name': 'XSS Scanner', 'rules': SARIF_RULES}},
+            'results': [],
+        }],
+    }
+    # Массив results дописывается потоково между "шапкой" и закрывающими скобками
+    head = json.dumps(header, ensure_ascii=False)
+    prefix, suffix = head[:-len(']}]}')], ']}]}'
+    yield prefix
+
+    first = True
+    for scan in scans:
+        for vuln in scan['vulnerabilities']:
+            result = {
+                'ruleId': vuln['vuln_type'],
+                'level': SARIF_LEVELS.get(vuln['severity'], 'warning'),
+                'message': {'text': vuln['description'] or vuln['vuln_type']},
+                'locations': [{
+                    'physicalLocation': {'artifactLocation': {'uri': scan['url']}},
+                    'logicalLocations': [{'name': vuln['location']}] if vuln['location'] else [],
+                }],
+                'properties': {
+                    'scan_id': scan['scan_id'],
+                    'scan_type': scan['scan_type'],
+                    'timestamp': scan['timestamp'],
+                    'severity': vuln['severity'],
+                    'risk_score': vuln['risk_score'],
+                    'evidence': vuln['evidence'],
+                },
+            }
+            yield ('' if first else ',') + json.dumps(result, ensure_ascii=False)
+            first = False
+
+    yield suffix
+
+
+EXPORTERS = {
+    'jsonl': export_jsonl,
+    'csv': export_csv,
+    'sarif': export_sarif,
+}
+
+
+def export(db, fmt='jsonl', chunk_size=500, **filters):
+    """Генератор строк выгрузки в заданном формате"""
+    if fmt not in EXPORTERS:
+        raise ValueError(f'Неизвестный формат: {fmt}')
+    return EXPORTERS[fmt](iter_scans(db, chunk_size=chunk_size, **filters))
+
+
+def encode_stream(chunks, compress=False, min_chunk=64 * 1024):
+    """Кодирует строки в UTF-8, при compress=True сжимает в gzip на лету"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    pending = []
+    pending_size = 0
+
+    for chunk in chunks:
+        # Одиночный суррогат в сохранённых данных не должен обрывать уже
+        # начатый ответ: он записывается как escape \udXXX
+        data = chunk.encode('utf-8', errors='backslashreplace')
+        if compressor:
+            data = compressor.compress(data)
+        if not data:
+            continue
+        pending.append(data)
+        pending_size += len(data)
+        # Мелкие куски объединяются, чтобы не отправлять тысячи крошечных блоков
+        if pending_size >= min_chunk:
+            yield b''.join(pending)
+            pending = []
+            pending_size = 0
+
+    if compressor:
+        pending.append(compressor.flush())
+    if pending:
+        yield b''.join(pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Выгрузка результатов XSS Scanner')
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='jsonl')
+    parser.add_argument('--db', default='xss_scanner.db')
+    parser.add_argument('--since', help='с даты (ГГГГ-ММ-ДД)')
+    parser.add_argument('--until', help='по дату включительно (ГГГГ-ММ-ДД)')
+    parser.add_argument('--host', help='только сканирования этого хоста')
+    parser.add_argument('--severity', help='уровни через запятую: high,medium,low')
+    parser.add_argument('--gzip', action='store_true', help='сжать вывод gzip')
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('-o', '--output', help='файл вывода (по умолчанию stdout)')
+    args = parser.parse_args()
+
+    try:
+        filters = parse_filters(args.since, args.until, args.host, args.severity)
+    except ValueError as e:
+        parser.error(str(e))
+
+    stream = encode_stream(
+        export(Database(args.db), args.format, args.chunk_size, **filters),
+        compress=args.gzip
+    )
+
+    output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for data in stream:
+            output.write(data)
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
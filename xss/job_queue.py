@@ -0,0 +1,194 @@
+import logging
+import time
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+# Время аренды задания воркером, секунд; продлевается heartbeat'ами
+DEFAULT_LEASE_SECONDS = 60
+
+
+class Job:
+    """Задание на сканирование, выданное воркеру"""
+
+    def __init__(self, job_id, scan_id, url, scan_type, attempts, max_attempts, worker_id):
+        self.id = job_id
+        self.scan_id = scan_id
+        self.url = url
+        self.scan_type = scan_type
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.worker_id = worker_id
+
+    def __repr__(self):
+        return f'<Job {self.id} scan={self.scan_id} attempt={self.attempts}/{self.max_attempts}>'
+
+
+class JobQueue:
+    """
+    Интерфейс очереди заданий на сканирование.
+
+    Задание выдаётся воркеру в аренду на lease_seconds. Воркер продлевает
+    аренду через heartbeat; если он пропал, после истечения аренды задание
+    снова становится доступным, пока не исчерпан лимит попыток.
+    """
+
+    def enqueue(self, scan_id, url, scan_type, max_attempts=3):
+        raise NotImplementedError
+
+    def claim(self, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Выдаёт следующее доступное задание или None"""
+        raise NotImplementedError
+
+    def heartbeat(self, job, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Продлевает аренду; False, если задание уже не принадлежит воркеру"""
+        raise NotImplementedError
+
+    def complete(self, job):
+        raise NotImplementedError
+
+    def fail(self, job, error, retry_delay=5):
+        """Возвращает задание в очередь или помечает его проваленным.
+
+        Возвращает True, если задание будет повторено, False - если нет,
+        и None, если задание уже не принадлежит воркеру.
+        """
+        raise NotImplementedError
+
+    def cancel(self, scan_id):
+        """Снимает с очереди ещё не выданные задания сканирования"""
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+
+class SQLiteJobQueue(JobQueue):
+    """Очередь в таблице scan_jobs той же базы SQLite, что и результаты"""
+
+    def __init__(self, db=None):
+        self.db = db or Database()
+
+    def enqueue(self, scan_id, url, scan_type, max_attempts=3):
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO scan_jobs (scan_id, url, scan_type, status, max_attempts, available_at)
+                VALUES (?, ?, ?, 'queued', ?, ?)
+            ''', (scan_id, url, scan_type, max_attempts, time.time()))
+            return cursor.lastrowid
+
+    def claim(self, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        now = time.time()
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            # Блокировка на запись: два воркера не получат одно задание
+            cursor.execute('BEGIN IMMEDIATE')
+
+            # Брошенные задания, исчерпавшие попытки, больше не выдаются, а их
+            # сканирования завершаются ошибкой, чтобы страница не ждала вечно
+            cursor.execute('''
+                UPDATE scans
+                SET status = 'error', progress = 0, message = 'Ошибка: аренда задания истекла'
+                WHERE status NOT IN ('completed', 'truncated', 'cancelled', 'error')
+                  AND scan_id IN (
+                      SELECT scan_id FROM scan_jobs
+                      WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts
+                  )
+            ''', (now,))
+            cursor.execute('''
+                UPDATE scan_jobs
+                SET status = 'failed', last_error = 'Аренда истекла', updated_at = CURRENT_TIMESTAMP
+                WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts
+            ''', (now,))
+
+            cursor.execute('''
+                SELECT * FROM scan_jobs
+                WHERE (status = 'queued' AND available_at <= ?)
+                   OR (status = 'running' AND lease_expires < ?)
+                ORDER BY id
+                LIMIT 1
+            ''', (now, now))
+            row = cursor.fetchone()
+            if not row:
+                return None
+
+            if row['status'] == 'running':
+                logger.warning("Job %d abandoned by %s, reassigning to %s",
+                               row['id'], row['worker_id'], worker_id)
+
+            cursor.execute('''
+                UPDATE scan_jobs
+                SET status = 'running', worker_id = ?, lease_expires = ?,
+                    attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (worker_id, now + lease_seconds, row['id']))
+
+            return Job(row['id'], row['scan_id'], row['url'], row['scan_type'],
+                       row['attempts'] + 1, row['max_attempts'], worker_id)
+
+    def heartbeat(self, job, lease_seconds=DEFAULT_LEASE_SECONDS):
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE scan_jobs
+                SET lease_expires = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND worker_id = ? AND status = 'running'
+            ''', (time.time() + lease_seconds, job.id, job.worker_id))
+            return cursor.rowcount == 1
+
+    def complete(self, job):
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE scan_jobs
+                SET status = 'done', lease_expires = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND worker_id = ?
+            ''', (job.id, job.worker_id))
+            return cursor.rowcount == 1
+
+    def fail(self, job, error, retry_delay=5):
+        retry = job.attempts < job.max_attempts
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE scan_jobs
+                SET status = ?, worker_id = NULL, lease_expires = NULL, available_at = ?,
+                    last_error = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND worker_id = ?
+            ''', ('queued' if retry else 'failed', time.time() + retry_delay,
+                  str(error), job.id, job.worker_id))
+            if cursor.rowcount == 0:
+                return None
+        return retry
+
+    def cancel(self, scan_id):
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE scan_jobs
+                SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP
+                WHERE scan_id = ? AND status = 'queued'
+            ''', (scan_id,))
+            return cursor.rowcount
+
+    def stats(self):
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT status, COUNT(*) as count FROM scan_jobs GROUP BY status')
+            return {row['status']: row['count'] for row in cursor.fetchall()}
+
+
+# Доступные реализации очереди; другие бэкенды регистрируются здесь же
+JOB_QUEUE_BACKENDS = {
+    'sqlite': SQLiteJobQueue,
+}
+
+
+def create_job_queue(backend='sqlite', **options):
+    try:
+        queue_class = JOB_QUEUE_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f'Неизвестный бэкенд очереди: {backend}')
+    return queue_class(**options)
@@ -0,0 +1,154 @@
+import time
+from contextlib import contextmanager
+
+# Лимиты по умолчанию на одно сканирование
+DEFAULT_MAX_SECONDS = 120
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_MAX_PAGES = 20
+DEFAULT_MAX_DETECTOR_SECONDS = 30
+
+
+class BudgetExceeded(Exception):
+    """Сканирование остановлено: исчерпан лимит ресурсов"""
+
+    def __init__(self, reason, message=''):
+        super().__init__(message or reason)
+        self.reason = reason
+
+
+class ScanCancelled(BudgetExceeded):
+    """Сканирование отменено пользователем"""
+
+    def __init__(self, message='Сканирование отменено'):
+        super().__init__('cancelled', message)
+
+
+class ScanBudget:
+    """
+    Лимиты одного сканирования: время, объём загрузки, число страниц и
+    процессорное время детектора.
+
+    Проверки кооперативные: сканер и детектор вызывают check() между
+    шагами, и при превышении лимита или запросе отмены выбрасывается
+    BudgetExceeded. Лимит объёма "мягкий": загрузка обрезается, уже
+    полученное содержимое проверяется, а сканирование помечается усечённым.
+    """
+
+    def __init__(self, max_seconds=DEFAULT_MAX_SECONDS, max_bytes=DEFAULT_MAX_BYTES,
+                 max_pages=DEFAULT_MAX_PAGES, max_detector_seconds=DEFAULT_MAX_DETECTOR_SECONDS,
+                 cancel_check=None, cancel_poll_interval=1.0):
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.max_pages = max_pages
+        self.max_detector_seconds = max_detector_seconds
+        self.cancel_check = cancel_check
+        self.cancel_poll_interval = cancel_poll_interval
+
+        self.started_at = None
+        self.bytes_downloaded = 0
+        self.pages_fetched = 0
+        self.detector_seconds = 0.0
+        self.truncated_reason = None
+
+        self._detector_started = None
+        self._next_cancel_poll = 0.0
+        self._cancel_requested = False
+
+    def start(self):
+        self.started_at = time.monotonic()
+        return self
+
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return time.monotonic() - self.started_at
+
+    def remaining_seconds(self):
+        if self.max_seconds is None:
+            return None
+        return max(self.max_seconds - self.elapsed(), 0.0)
+
+    def remaining_bytes(self):
+        if self.max_bytes is None:
+            return None
+        return max(self.max_bytes - self.bytes_downloaded, 0)
+
+    def request_timeout(self, default):
+        """Таймаут HTTP-запроса с учётом оставшегося времени"""
+        remaining = self.remaining_seconds()
+        if remaining is None:
+            return default
+        return max(min(default, remaining), 0.1)
+
+    def add_page(self):
+        self.pages_fetched += 1
+        if self.max_pages is not None and self.pages_fetched > self.max_pages:
+            self._exceed('pages', f'Превышен лимит страниц: {self.max_pages}')
+
+    def add_bytes(self, count):
+        """Учитывает загруженные байты; False, если лимит исчерпан"""
+        self.bytes_downloaded += count
+        if self.max_bytes is not None and self.bytes_downloaded >= self.max_bytes:
+            self.truncated_reason = self.truncated_reason or 'bytes'
+            return False
+        return True
+
+    def _current_detector_seconds(self):
+        if self._detector_started is None:
+            return self.detector_seconds
+        return self.detector_seconds + time.thread_time() - self._detector_started
+
+    @contextmanager
+    def detector(self):
+        """Учитывает процессорное время детектора внутри блока"""
+        if self._detector_started is not None:
+            yield
+            return
+        self._detector_started = time.thread_time()
+        try:
+            yield
+        finally:
+            self.detector_seconds += time.thread_time() - self._detector_started
+            self._detector_started = None
+
+    def _exceed(self, reason, message):
+        self.truncated_reason = reason
+        raise BudgetExceeded(reason, message)
+
+    def cancel_requested(self):
+        """Опрашивает cancel_check без исключения; вызывается и из других потоков"""
+        if not self._cancel_requested and self.cancel_check is not None:
+            self._cancel_requested = bool(self.cancel_check())
+        return self._cancel_requested
+
+    def _poll_cancel(self):
+        if self.cancel_check is None:
+            return
+        if not self._cancel_requested:
+            now = time.monotonic()
+            if now < self._next_cancel_poll:
+                return
+            self._next_cancel_poll = now + self.cancel_poll_interval
+        if self.cancel_requested():
+            self.truncated_reason = 'cancelled'
+            raise ScanCancelled()
+
+    def check(self):
+        """Выбрасывает BudgetExceeded, если сканирование нужно остановить"""
+        self._poll_cancel()
+
+        if self.max_seconds is not None and self.elapsed() > self.max_seconds:
+            self._exceed('time', f'Превышен лимит времени: {self.max_seconds} с')
+
+        if (self.max_detector_seconds is not None and
+                self._current_detector_seconds() > self.max_detector_seconds):
+            self._exceed('detector_cpu',
+                         f'Превышен лимит времени детектора: {self.max_detector_seconds} с')
+
+    def usage(self):
+        return {
+            'elapsed_seconds': round(self.elapsed(), 3),
+            'bytes_downloaded': self.bytes_downloaded,
+            'pages_fetched': self.pages_fetched,
+            'detector_seconds': round(self._current_detector_seconds(), 3),
+        }
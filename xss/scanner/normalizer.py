@@ -0,0 +1,131 @@
+import base64
+import binascii
+import html
+import re
+from functools import lru_cache
+from urllib.parse import unquote
+
+# Максимальное число проходов декодирования (защита от "бесконечной" вложенности)
+MAX_DECODE_DEPTH = 5
+
+# Строки длиннее этого порога не кэшируются, чтобы кэш не раздувался
+MEMO_MAX_LEN = 4096
+
+# Суррогатная пара \uD83D\uDE00 разбирается целиком, чтобы получить один символ
+UNICODE_ESCAPE_RE = re.compile(
+    r'\\u([dD][89abAB][0-9a-fA-F]{2})\\u([dD][c-fC-F][0-9a-fA-F]{2})'
+    r'|\\u\{([0-9a-fA-F]{1,6})\}|\\u([0-9a-fA-F]{4})|\\x([0-9a-fA-F]{2})'
+)
+BASE64_MARKER_RE = re.compile(r'base64,', re.IGNORECASE)
+# Любой признак, при котором хотя бы один слой декодирования может сработать
+ENCODING_MARKER_RE = re.compile(r'[%&\\]|base64,', re.IGNORECASE)
+DATA_BASE64_RE = re.compile(r'(data:[^,;]{0,100}(?:;[^,;]{0,100})*;base64,)([A-Za-z0-9+/]+={0,2})',
+                            re.IGNORECASE)
+
+
+def _replace_unicode_escape(match):
+    high, low = match.group(1), match.group(2)
+    if high:
+        return chr(0x10000 + ((int(high, 16) - 0xD800) << 10) + (int(low, 16) - 0xDC00))
+
+    code = int(next(g for g in match.groups()[2:] if g), 16)
+    # Одиночный суррогат не кодируется в UTF-8, поэтому escape остаётся как есть
+    if code > 0x10FFFF or 0xD800 <= code <= 0xDFFF:
+        return match.group()
+    return chr(code)
+
+
+def _replace_data_base64(match):
+    payload = match.group(2)
+    try:
+        decoded = base64.b64decode(payload + '=' * (-len(payload) % 4), validate=True)
+    except (binascii.Error, ValueError):
+        return match.group()
+    return match.group(1) + decoded.decode('utf-8', errors='replace')
+
+
+def decode_url(text):
+    return unquote(text)
+
+
+def decode_html_entities(text):
+    return html.unescape(text)
+
+
+def decode_unicode_escapes(text):
+    return UNICODE_ESCAPE_RE.sub(_replace_unicode_escape, text)
+
+
+def decode_data_base64(text):
+    return DATA_BASE64_RE.sub(_replace_data_base64, text)
+
+
+# (признак, декодер): слой применяется, только если признак есть в тексте
+DECODERS = [
+    (lambda text: '%' in text, decode_url),
+    (lambda text: '&' in text, decode_html_entities),
+    (lambda text: '\\' in text, decode_unicode_escapes),
+    (lambda text: BASE64_MARKER_RE.search(text) is not None, decode_data_base64),
+]
+
+
+def _normalize(text, max_depth):
+    for _ in range(max_depth):
+        previous = text
+        for applies, decoder in DECODERS:
+            if applies(text):
+                text = decoder(text)
+        if text == previous:
+            break
+    return text
+
+
+@lru_cache(maxsize=8192)
+def _normalize_cached(text, max_depth):
+    return _normalize(text, max_depth)
+
+
+def normalize(text, max_depth=MAX_DECODE_DEPTH):
+    """
+    Многослойно декодирует текст (URL, HTML-сущности, \\u/\\x escape,
+    base64 в data: URI) до неподвижной точки, но не глубже max_depth.
+    """
+    if not ENCODING_MARKER_RE.search(text):
+        return text
+    if len(text) <= MEMO_MAX_LEN:
+        return _normalize_cached(text, max_depth)
+    return _normalize(text, max_depth)
+
+
+def changed_segments(text, max_depth=MAX_DECODE_DEPTH, budget=None):
+    """
+    Возвращает декодированные строки текста, которые изменились после
+    нормализации, объединённые через перевод строки. Если декодировать
+    нечего, возвращает пустую строку.
+
+    Обрабатываются только строки с признаками кодирования: повторяющиеся
+    строки (шаблонные куски страниц, одинаковые ссылки) берутся из кэша,
+    а неизменённые строки не передаются детектору повторно.
+    """
+    changed = []
+    pos = 0
+    while True:
+        match = ENCODING_MARKER_RE.search(text, pos)
+        if not match:
+            break
+
+        start = text.rfind('\n', 0, match.start()) + 1
+        end = text.find('\n', match.end())
+        if end == -1:
+            end = len(text)
+
+        if budget is not None:
+            budget.check()
+
+        line = text[start:end]
+        decoded = normalize(line, max_depth)
+        if decoded != line:
+            changed.append(decoded)
+        pos = end + 1
+
+    return '\n'.join(changed)
@@ -0,0 +1,240 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIGNATURES_PATH = os.environ.get(
+    'XSS_SIGNATURES_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'signatures.json')
+)
+
+SEVERITY_ORDER = {'low': 1, 'medium': 2, 'high': 3}
+CONTEXTS = ('html', 'attribute', 'url', 'script')
+
+# Не-ASCII символы, которые re.IGNORECASE считает ASCII-буквами: 'İ', 'ı', 'ſ', знак Кельвина
+IGNORECASE_ASCII_FOLD = str.maketrans({'\u0130': 'i', '\u0131': 'i', '\u017f': 's', '\u212a': 'k'})
+IGNORECASE_ASCII_FOLD_RE = re.compile('[\u0130\u0131\u017f\u212a]')
+
+
+def _keyword_regex(words):
+    """Выражение-дерево по словам: в позиции находит самое длинное из них"""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return re.compile(build(trie))
+
+
+class SignatureError(ValueError):
+    """Ошибка в файле сигнатур"""
+
+
+class Rule:
+    """Одна сигнатура XSS из файла правил"""
+
+    __slots__ = ('id', 'pattern', 'severity', 'context', 'keyword', 'description', 'regex')
+
+    def __init__(self, rule_id, pattern, severity='medium', context='html',
+                 keyword=None, description=''):
+        if severity not in SEVERITY_ORDER:
+            raise SignatureError(f'{rule_id}: неизвестный уровень "{severity}"')
+        if context not in CONTEXTS:
+            raise SignatureError(f'{rule_id}: неизвестный контекст "{context}"')
+        try:
+            regex = re.compile(pattern, re.IGNORECASE | re.DOTALL)
+        except re.error as e:
+            raise SignatureError(f'{rule_id}: некорректный паттерн: {e}')
+
+        self.id = rule_id
+        self.pattern = pattern
+        self.severity = severity
+        self.context = context
+        self.keyword = keyword.lower() if keyword else None
+        self.description = description
+        self.regex = regex
+
+
+class RuleSet:
+    """
+    Скомпилированный набор сигнатур с индексом по ключевым словам.
+
+    Правило с ключевым словом запускается только если слово встречается в
+    тексте (без учёта регистра, как в re.IGNORECASE). Все ASCII-слова
+    ищутся одним выражением-деревом за один проход, поэтому стоимость
+    поиска почти не зависит от числа правил. Объект неизменяем и
+    безопасно разделяется между потоками.
+    """
+
+    def __init__(self, rules, version=0, source=None):
+        seen = set()
+        for rule in rules:
+            if rule.id in seen:
+                raise SignatureError(f'Повторяющийся id сигнатуры: {rule.id}')
+            seen.add(rule.id)
+
+        self.rules = tuple(rules)
+        self.version = version
+        self.source = source
+        self.keywords = tuple(sorted({r.keyword for r in self.rules if r.keyword}))
+
+        # ASCII-слова ищутся одним проходом по тексту; в каждой позиции
+        # находится самое длинное слово, и оно засчитывает свои префиксы
+        ascii_keywords = [kw for kw in self.keywords if kw.isascii()]
+        keyword_set = set(ascii_keywords)
+        self.keyword_regex = _keyword_regex(ascii_keywords) if ascii_keywords else None
+        self.implied_keywords = {
+            kw: frozenset(kw[:i] for i in range(1, len(kw) + 1) if kw[:i] in keyword_set)
+            for kw in ascii_keywords
+        }
+        # Не-ASCII ключевые слова ищутся регулярным выражением с теми же правилами
+        # регистра, что и у самих сигнатур
+        self.keyword_patterns = {kw: re.compile(re.escape(kw), re.IGNORECASE)
+                                 for kw in self.keywords if not kw.isascii()}
+
+    @classmethod
+    def from_dict(cls, data, source=None):
+        if not isinstance(data, dict) or not isinstance(data.get('rules'), list):
+            raise SignatureError('Файл сигнатур должен содержать список "rules"')
+
+        rules = []
+        for raw in data['rules']:
+            try:
+                rules.append(Rule(
+                    raw['id'],
+                    raw['pattern'],
+                    severity=raw.get('severity', 'medium'),
+                    context=raw.get('context', 'html'),
+                    keyword=raw.get('keyword'),
+                    description=raw.get('description', '')
+                ))
+            except KeyError as e:
+                raise SignatureError(f'В сигнатуре отсутствует поле {e}')
+
+        return cls(rules, version=data.get('version', 0), source=source)
+
+    @classmethod
+    def from_file(cls, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise SignatureError(f'Не удалось прочитать {path}: {e}')
+        return cls.from_dict(data, source=path)
+
+    @property
+    def patterns(self):
+        return [rule.pattern for rule in self.rules]
+
+    def candidates(self, text):
+        """Правила, которые имеет смысл запускать на тексте (в порядке файла)"""
+        folded = text
+        if not text.isascii() and IGNORECASE_ASCII_FOLD_RE.search(text):
+            folded = text.translate(IGNORECASE_ASCII_FOLD)
+        lowered = folded.lower()
+        present = set()
+        if self.keyword_regex is not None:
+            # Поиск продолжается со следующего символа после начала совпадения,
+            # чтобы найти и пересекающиеся слова ('window.location' и 'location.href')
+            search = self.keyword_regex.search
+            match = search(lowered)
+            while match:
+                present.update(self.implied_keywords[match.group()])
+                match = search(lowered, match.start() + 1)
+        for kw, pattern in self.keyword_patterns.items():
+            if pattern.search(text):
+                present.add(kw)
+        return [r for r in self.rules if r.keyword is None or r.keyword in present]
+
+    def match(self, text, budget=None):
+        """Возвращает список (rule, matches) для всех сработавших правил"""
+        hits = []
+        for rule in self.candidates(text):
+            if budget is not None:
+                budget.check()
+            matches = rule.regex.findall(text)
+            if matches:
+                hits.append((rule, matches))
+        return hits
+
+
+class SignatureDatabase:
+    """
+    Источник актуального набора сигнатур с горячей перезагрузкой.
+
+    Файл проверяется не чаще раза в check_interval секунд. Новый набор
+    собирается целиком и подменяется одной операцией присваивания, так что
+    уже идущие проверки дорабатывают на прежнем наборе. Если новый файл
+    содержит ошибку, остаётся предыдущий набор.
+    """
+
+    def __init__(self, path=DEFAULT_SIGNATURES_PATH, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._ruleset = None
+        self._mtime = None
+        self._next_check = 0.0
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self):
+        """Принудительно перечитывает файл сигнатур"""
+        with self._lock:
+            mtime = self._file_mtime()
+            ruleset = RuleSet.from_file(self.path)
+            self._ruleset = ruleset
+            self._mtime = mtime
+            logger.info("Loaded %d XSS signatures (version %s) from %s",
+                        len(ruleset.rules), ruleset.version, self.path)
+            return ruleset
+
+    def current(self):
+        """Возвращает текущий набор, при необходимости перезагружая файл"""
+        ruleset = self._ruleset
+        if ruleset is None:
+            return self.reload()
+
+        now = time.monotonic()
+        if now < self._next_check:
+            return ruleset
+        self._next_check = now + self.check_interval
+
+        if self._file_mtime() != self._mtime:
+            try:
+                return self.reload()
+            except SignatureError as e:
+                logger.error(f"Ошибка перезагрузки сигнатур, используется прежний набор: {str(e)}")
+                self._mtime = self._file_mtime()
+        return self._ruleset
+
+
+_default_database = None
+_default_lock = threading.Lock()
+
+
+def get_signature_database():
+    """Общая для процесса база сигнатур"""
+    global _default_database
+    if _default_database is None:
+        with _default_lock:
+            if _default_database is None:
+                _default_database = SignatureDatabase()
+    return _default_database
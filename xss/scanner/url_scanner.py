@@ -1,24 +1,68 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from requests.compat import chardet
 from urllib.parse import urljoin, urlparse
 import logging
+import socket
+import threading
+import weakref
 from .xss_detector import XSSDetector
+from .budget import BudgetExceeded, ScanBudget
 import time
 
 logger = logging.getLogger(__name__)
 
 
+def _html_parser():
+    """Загружает BeautifulSoup только при глубоком сканировании"""
+    from bs4 import BeautifulSoup
+    return BeautifulSoup
+
+
+def _tracked_pool(pool_class, sockets):
+    class TrackedConnection(pool_class.ConnectionCls):
+        def connect(self):
+            super().connect()
+            # Соединение может отдать сокет ответу и забыть его, поэтому
+            # запоминается сам сокет
+            sockets.add(self.sock)
+
+    return type(pool_class.__name__, (pool_class,), {'ConnectionCls': TrackedConnection})
+
+
+class _TrackingAdapter(HTTPAdapter):
+    """Адаптер, запоминающий сокеты соединений, чтобы их можно было оборвать"""
+
+    def __init__(self, sockets, **kwargs):
+        self.sockets = sockets
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: _tracked_pool(pool_class, self.sockets)
+            for scheme, pool_class in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+
 class URLScanner:
     """Сканер URL на наличие XSS уязвимостей"""
 
     def __init__(self):
         self.xss_detector = XSSDetector()
+        self.budget = ScanBudget()
         self.session = requests.Session()
+        self._sockets = weakref.WeakSet()
+        adapter = _TrackingAdapter(self._sockets)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
 
-    def scan_url(self, url, scan_type='fast'):
+    def scan_url(self, url, scan_type='fast', budget=None):
+
+        self.budget = (budget or ScanBudget()).start()
 
         try:
 
@@ -37,13 +81,21 @@ class URLScanner:
                 'scan_summary': {}
             }
 
-            # Быстрое сканирование
-            if scan_type == 'fast':
-                self._fast_scan(url, results)
-            # Глубокое сканирование
-            else:
-                self._deep_scan(url, results)
-
+            try:
+                # Быстрое сканирование
+                if scan_type == 'fast':
+                    self._fast_scan(url, results)
+                # Глубокое сканирование
+                else:
+                    self._deep_scan(url, results)
+            except BudgetExceeded as e:
+                logger.warning(f"Сканирование {url} остановлено: {str(e)}")
+
+            # Частичные результаты сохраняются с пометкой об усечении
+            if self.budget.truncated_reason:
+                results['truncated'] = True
+                results['truncated_reason'] = self.budget.truncated_reason
+            results['resource_usage'] = self.budget.usage()
 
             self._generate_summary(results)
 
@@ -53,14 +105,83 @@ class URLScanner:
             logger.error(f"Ошибка при сканировании {url}: {str(e)}")
             return {'error': f'Ошибка сканирования: {str(e)}'}
 
+    def _abort_connections(self):
+        """Обрывает текущие соединения: блокирующее чтение сразу завершается ошибкой"""
+        for sock in list(self._sockets):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _watchdog(self, done):
+        """Обрывает загрузку, когда исчерпано время или запрошена отмена"""
+        poll_interval = self.budget.cancel_poll_interval if self.budget.cancel_check else None
+        while True:
+            waits = [t for t in (self.budget.remaining_seconds(), poll_interval) if t is not None]
+            if done.wait(min(waits) if waits else None):
+                return
+            if self.budget.remaining_seconds() == 0 or self.budget.cancel_requested():
+                self._abort_connections()
+                return
+
+    def _fetch(self, url, timeout):
+        """Загружает страницу в пределах бюджета по времени и объёму"""
+        self.budget.check()
+        self.budget.add_page()
+
+        # Таймаут запроса действует на каждое чтение отдельно, и сервер, отдающий
+        # по байту, держал бы его сколь угодно долго. Жёсткий срок и отмену
+        # обеспечивает сторожевой поток: он обрывает соединение.
+        done = threading.Event()
+        watchdog = threading.Thread(target=self._watchdog, args=(done,))
+        watchdog.daemon = True
+        watchdog.start()
+
+        try:
+            response = self.session.get(url, timeout=self.budget.request_timeout(timeout), stream=True)
+            try:
+                response.raise_for_status()
+
+                chunks = []
+                for chunk in response.iter_content(chunk_size=65536):
+                    remaining = self.budget.remaining_bytes()
+                    if remaining is not None and len(chunk) > remaining:
+                        chunk = chunk[:remaining]
+                    chunks.append(chunk)
+                    if not self.budget.add_bytes(len(chunk)):
+                        logger.warning(f"Страница {url} обрезана по лимиту объёма")
+                        break
+                    self.budget.check()
+            finally:
+                response.close()
+        except (requests.RequestException, OSError):
+            # Таймаут, урезанный по бюджету, или обрыв соединения сторожем
+            # означают исчерпание лимита времени или отмену
+            if self.budget.remaining_seconds() == 0 or self.budget.cancel_requested():
+                self.budget.check()
+            raise
+        finally:
+            done.set()
+            watchdog.join()
+
+        # Оборванный сторожем ответ может выглядеть как завершённый
+        self.budget.check()
+
+        # Как response.text: без charset кодировка определяется по содержимому
+        body = b''.join(chunks)
+        encoding = response.encoding or chardet.detect(body)['encoding']
+        try:
+            return str(body, encoding or 'utf-8', errors='replace')
+        except LookupError:
+            return str(body, 'utf-8', errors='replace')
+
     def _fast_scan(self, url, results):
 
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
+            page = self._fetch(url, timeout=10)
 
 
-            html_scan = self.xss_detector.check(response.text)
+            html_scan = self.xss_detector.check(page, self.budget)
             if html_scan['is_threat']:
                 results['vulnerabilities'].append({
                     'type': 'reflected_xss',
@@ -75,7 +196,7 @@ class URLScanner:
             query_params = self._parse_query_params(parsed_url.query)
 
             for param, value in query_params.items():
-                param_scan = self.xss_detector.scan_input(value)
+                param_scan = self.xss_detector.scan_input(value, self.budget)
                 if param_scan['is_threat']:
                     results['vulnerabilities'].append({
                         'type': 'reflected_xss',
@@ -92,14 +213,14 @@ class URLScanner:
     def _deep_scan(self, url, results):
         """Глубокое сканирование URL"""
         try:
-            response = self.session.get(url, timeout=15)
-            response.raise_for_status()
+            page = self._fetch(url, timeout=15)
 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = _html_parser()(page, 'html.parser')
 
 
             forms = soup.find_all('form')
             for i, form in enumerate(forms):
+                self.budget.check()
                 form_scan = self._scan_form(form, url)
                 if form_scan:
                     results['vulnerabilities'].extend(form_scan)
@@ -107,8 +228,9 @@ class URLScanner:
             # Проверяем ссылки
             links = soup.find_all('a', href=True)
             for link in links[:50]:
+                self.budget.check()
                 href = link['href']
-                link_scan = self.xss_detector.scan_input(href)
+                link_scan = self.xss_detector.scan_input(href, self.budget)
                 if link_scan['is_threat']:
                     results['vulnerabilities'].append({
                         'type': 'stored_xss',
@@ -122,8 +244,9 @@ class URLScanner:
             # Проверяем скрипты
             scripts = soup.find_all('script')
             for script in scripts:
+                self.budget.check()
                 if script.string:
-                    script_scan = self.xss_detector.check(script.string)
+                    script_scan = self.xss_detector.check(script.string, self.budget)
                     if script_scan['is_threat']:
                         results['vulnerabilities'].append({
                             'type': 'dom_xss',
@@ -148,11 +271,12 @@ class URLScanner:
 
             inputs = form.find_all('input')
             for input_field in inputs:
+                self.budget.check()
                 input_name = input_field.get('name', '')
                 input_value = input_field.get('value', '')
 
                 if input_name:
-                    value_scan = self.xss_detector.scan_input(input_value)
+                    value_scan = self.xss_detector.scan_input(input_value, self.budget)
                     if value_scan['is_threat']:
                         vulnerabilities.append({
                             'type': 'stored_xss',
@@ -163,6 +287,8 @@ class URLScanner:
                             'risk_score': self._calculate_risk_score(value_scan['threat_level'])
                         })
 
+        except BudgetExceeded:
+            raise
         except Exception as e:
             logger.error(f"Ошибка при сканировании формы: {str(e)}")
 
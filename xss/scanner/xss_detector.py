@@ -1,63 +1,40 @@
 import re
 import logging
+from collections import Counter
+from contextlib import nullcontext
 from urllib.parse import unquote, urlparse
-import html
+from .signatures import SEVERITY_ORDER, get_signature_database
+from . import normalizer
 
 logger = logging.getLogger(__name__)
 
 
+DETAILED_CHECKS = {
+    'script_tags': re.compile(r'<script(?:(?!<script)[^>\n])*>', re.IGNORECASE),
+    'event_handlers': re.compile(r'on\w{1,64}\s*=', re.IGNORECASE),
+    'javascript_protocol': re.compile(r'javascript:', re.IGNORECASE),
+    'dangerous_tags': re.compile(r'<(iframe|embed|object|form)', re.IGNORECASE),
+}
+
+
 class XSSDetector:
     """Класс для обнаружения XSS-атак"""
 
-    def __init__(self):
-        # Паттерны для обнаружения XSS
-        self.patterns = [
-            # Базовые теги скриптов
-            r'<script.*?>.*?</script>',
-            r'<script.*?>',
-
-            # События JavaScript
-            r'on\w+\s*=',
-            r'onload\s*=',
-            r'onerror\s*=',
-            r'onclick\s*=',
-            r'onmouseover\s*=',
-
-            # Протоколы выполнения
-            r'javascript:',
-            r'vbscript:',
-            r'data:\s*text/html',
-
-            # Опасные HTML-теги
-            r'<\s*iframe',
-            r'<\s*embed',
-            r'<\s*object',
-            r'<\s*form',
-            r'<\s*meta',
-
-            # Функции JavaScript
-            r'eval\s*\(',
-            r'alert\s*\(',
-            r'prompt\s*\(',
-            r'confirm\s*\(',
-            r'console\.log\s*\(',
-
-            # Работа с DOM и cookies
-            r'document\.cookie',
-            r'document\.write',
-            r'window\.location',
-            r'window\.open',
-            r'location\.href',
-
-            # SVG-инъекции
-            r'<svg.*?>',
-            r'<math.*?>',
-        ]
-
-        self.compiled_patterns = [re.compile(p, re.IGNORECASE | re.DOTALL) for p in self.patterns]
-        logger.info("XSS Detector initialized with %d patterns", len(self.patterns))
-
-    def check(self, text):
+    def __init__(self, signatures=None, decode=True, max_decode_depth=normalizer.MAX_DECODE_DEPTH):
+        # Сигнатуры загружаются из файла правил и разделяются всеми детекторами
+        self.signatures = signatures or get_signature_database()
+        self.decode = decode
+        self.max_decode_depth = max_decode_depth
+
+    @property
+    def patterns(self):
+        return self.signatures.current().patterns
+
+    @property
+    def compiled_patterns(self):
+        return [rule.regex for rule in self.signatures.current().rules]
+
+    def check(self, text, budget=None):
         """
         Проверяет текст на наличие XSS-угроз
 
@@ -67,45 +44,77 @@ class XSSDetector:
             text = str(text)
 
         threats_found = []
+        matched_rules = []
         threat_level = "low"
 
 
         decoded_text = unquote(text)
 
+        # Набор фиксируется на время проверки, перезагрузка его не затронет
+        ruleset = self.signatures.current()
+
+        with budget.detector() if budget is not None else nullcontext():
+            hits = ruleset.match(decoded_text, budget)
 
-        for pattern in self.compiled_patterns:
-            matches = pattern.findall(decoded_text)
-            if matches:
-                threats_found.extend(matches)
+            # Многослойно закодированные фрагменты проверяются отдельно,
+            # повторно детектор запускается только на изменившихся строках
+            normalized_text = ''
+            if self.decode:
+                normalized_text = normalizer.changed_segments(
+                    decoded_text, self.max_decode_depth, budget)
+                if normalized_text:
+                    hits.extend(self._new_hits(hits, ruleset.match(normalized_text, budget)))
 
+        max_severity = 0
+        for rule, matches in hits:
+            threats_found.extend(matches)
+            if rule.id not in matched_rules:
+                matched_rules.append(rule.id)
+            max_severity = max(max_severity, SEVERITY_ORDER[rule.severity])
 
-        if any(tag in decoded_text.lower() for tag in ['<script', 'javascript:', 'onload=']):
+
+        if (max_severity >= SEVERITY_ORDER['high'] or
+                any(tag in decoded_text.lower() or tag in normalized_text.lower()
+                    for tag in ['<script', 'javascript:', 'onload='])):
             threat_level = "high"
-        elif threats_found:
+        elif max_severity >= SEVERITY_ORDER['medium']:
             threat_level = "medium"
 
         return {
             'is_threat': len(threats_found) > 0,
             'threat_level': threat_level,
             'threats_found': threats_found[:10],  # Ограничиваем количество для отчета
-            'threat_count': len(threats_found)
+            'threat_count': len(threats_found),
+            'matched_rules': matched_rules
         }
 
-    def scan_input(self, input_text):
+    @staticmethod
+    def _new_hits(base_hits, decoded_hits):
+        """Оставляет совпадения, которых не было в исходном тексте"""
+        seen = {rule.id: Counter(matches) for rule, matches in base_hits}
+        fresh = []
+        for rule, matches in decoded_hits:
+            counter = seen.get(rule.id, Counter())
+            new_matches = []
+            for match in matches:
+                if counter[match] > 0:
+                    counter[match] -= 1
+                else:
+                    new_matches.append(match)
+            if new_matches:
+                fresh.append((rule, new_matches))
+        return fresh
+
+    def scan_input(self, input_text, budget=None):
         """
         Сканирует пользовательский ввод на XSS
 
 
         """
-        result = self.check(input_text)
+        result = self.check(input_text, budget)
 
         # Дополнительная проверка
-        checks = {
-            'script_tags': bool(re.search(r'<script.*?>', input_text, re.IGNORECASE)),
-            'event_handlers': bool(re.search(r'on\w+\s*=', input_text, re.IGNORECASE)),
-            'javascript_protocol': bool(re.search(r'javascript:', input_text, re.IGNORECASE)),
-            'dangerous_tags': bool(re.search(r'<(iframe|embed|object|form)', input_text, re.IGNORECASE))
-        }
+        checks = {name: bool(pattern.search(input_text)) for name, pattern in DETAILED_CHECKS.items()}
 
         result['detailed_checks'] = checks
         return result
\ No newline at end of file
@@ -0,0 +1,203 @@
+"""
+Воркер распределённого сканирования.
+
+Забирает задания из общей очереди (по умолчанию таблица scan_jobs в базе
+SQLite) и записывает результаты через Database. Воркеров можно запускать
+сколько угодно, в том числе на разных машинах с общим бэкендом очереди.
+
+    python worker.py --processes 4 --db xss_scanner.db
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import uuid
+
+from database import Database
+from scanner.budget import ScanBudget
+from job_queue import DEFAULT_LEASE_SECONDS, JOB_QUEUE_BACKENDS, create_job_queue
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(Exception):
+    """Задание передано другому воркеру, результаты записывать нельзя"""
+
+
+def save_results(db, scan_id, results):
+    """Сохраняет результаты и итоговый статус: completed, truncated или cancelled"""
+    db.save_scan_results(scan_id, results)
+    if results.get('truncated_reason') == 'cancelled':
+        db.update_scan_status(scan_id, 'cancelled', 100, 'Сканирование отменено, сохранены частичные результаты')
+    elif results.get('truncated'):
+        db.update_scan_status(scan_id, 'truncated', 100,
+                              f"Превышен лимит ({results['truncated_reason']}), сохранены частичные результаты")
+    else:
+        db.update_scan_status(scan_id, 'completed', 100, 'Сканирование завершено')
+
+
+def run_scan(db, url, scan_type, scan_id, lease_lost=None):
+    """Выполняет сканирование и сохраняет результаты. Исключения пробрасываются
+
+    lease_lost - необязательное событие; если оно установлено, сканирование
+    останавливается, а результаты не сохраняются (LeaseLost).
+    """
+    from scanner.url_scanner import URLScanner
+
+    def should_stop():
+        return (lease_lost is not None and lease_lost.is_set()) or db.is_cancel_requested(scan_id)
+
+    budget = ScanBudget(cancel_check=should_stop)
+
+    logger.info(f"Начато сканирование URL: {url}")
+
+    db.update_scan_status(scan_id, 'running', 25, 'Инициализация сканера...')
+
+    scanner = URLScanner()
+
+    db.update_scan_status(scan_id, 'running', 50, 'Сканирование на XSS...')
+
+    results = scanner.scan_url(url, scan_type, budget)
+
+    if lease_lost is not None and lease_lost.is_set():
+        raise LeaseLost(f'Аренда задания для {scan_id} потеряна')
+
+    save_results(db, scan_id, results)
+
+    logger.info(f"Сканирование завершено для URL: {url}")
+    return results
+
+
+class Worker:
+    """Цикл обработки заданий одного процесса"""
+
+    def __init__(self, queue, db, worker_id=None, lease_seconds=DEFAULT_LEASE_SECONDS,
+                 poll_interval=1.0):
+        self.queue = queue
+        self.db = db
+        self.worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}'
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def _heartbeat_loop(self, job, done, lease_lost):
+        interval = max(self.lease_seconds / 3, 0.1)
+        while not done.wait(interval):
+            try:
+                if not self.queue.heartbeat(job, self.lease_seconds):
+                    logger.warning("Lost lease on job %d, stopping scan", job.id)
+                    lease_lost.set()
+                    return
+            except Exception as e:
+                logger.error(f"Ошибка heartbeat для задания {job.id}: {str(e)}")
+
+    def process(self, job):
+        done = threading.Event()
+        lease_lost = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, args=(job, done, lease_lost))
+        heartbeat.daemon = True
+        heartbeat.start()
+
+        try:
+            run_scan(self.db, job.url, job.scan_type, job.scan_id, lease_lost)
+            if not self.queue.complete(job):
+                logger.warning("Job %d was reassigned before completion", job.id)
+        except LeaseLost as e:
+            logger.warning(f"Результаты не сохранены: {str(e)}")
+        except Exception as e:
+            logger.error(f"Ошибка при сканировании: {str(e)}")
+            retry = None if lease_lost.is_set() else self.queue.fail(job, e)
+            if retry is None:
+                # Заданием уже владеет другой воркер, статус сканирования не трогаем
+                logger.warning("Job %d was reassigned, not updating scan status", job.id)
+            elif retry:
+                self.db.update_scan_status(job.scan_id, 'pending', 0,
+                                           f'Повтор после ошибки: {str(e)}')
+            else:
+                self.db.update_scan_status(job.scan_id, 'error', 0, f'Ошибка: {str(e)}')
+        finally:
+            done.set()
+            heartbeat.join()
+
+    def run(self, max_jobs=None, exit_when_idle=False):
+        """Обрабатывает задания, пока не вызван stop() или не достигнут max_jobs"""
+        processed = 0
+        logger.info("Worker %s started", self.worker_id)
+
+        while not self._stop.is_set():
+            job = self.queue.claim(self.worker_id, self.lease_seconds)
+            if job is None:
+                if exit_when_idle:
+                    break
+                self._stop.wait(self.poll_interval)
+                continue
+
+            self.process(job)
+            processed += 1
+            if max_jobs is not None and processed >= max_jobs:
+                break
+
+        logger.info("Worker %s stopped after %d jobs", self.worker_id, processed)
+        return processed
+
+
+def _worker_main(db_path, backend, lease_seconds, poll_interval, exit_when_idle):
+    db = Database(db_path)
+    queue = create_job_queue(backend, db=db)
+    worker = Worker(queue, db, lease_seconds=lease_seconds, poll_interval=poll_interval)
+    try:
+        worker.run(exit_when_idle=exit_when_idle)
+    except KeyboardInterrupt:
+        pass
+
+
+def run_workers(processes=1, db_path='xss_scanner.db', backend='sqlite',
+                lease_seconds=DEFAULT_LEASE_SECONDS, poll_interval=1.0, exit_when_idle=False):
+    """Запускает processes процессов-воркеров и ждёт их завершения"""
+    # Миграция выполняется один раз до старта процессов
+    Database(db_path).ensure_schema()
+
+    workers = []
+    for _ in range(processes):
+        process = multiprocessing.Process(
+            target=_worker_main,
+            args=(db_path, backend, lease_seconds, poll_interval, exit_when_idle)
+        )
+        process.start()
+        workers.append(process)
+
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        for process in workers:
+            process.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Воркер XSS Scanner')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--db', default='xss_scanner.db')
+    parser.add_argument('--backend', default='sqlite', choices=sorted(JOB_QUEUE_BACKENDS))
+    parser.add_argument('--lease', type=float, default=DEFAULT_LEASE_SECONDS)
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    parser.add_argument('--exit-when-idle', action='store_true',
+                        help='завершиться, когда очередь пуста')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    run_workers(args.processes, args.db, args.backend, args.lease,
+                args.poll_interval, args.exit_when_idle)
+
+
+if __name__ == '__main__':
+    main()